@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code Hooks 公共模块
+
+功能: 各 hook 共用的路径常量与日志写入函数
+"""
+
+import os
+import json
+from pathlib import Path
+
+# 可选依赖：orjson（C 实现的 JSON 编解码），未安装时使用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+PROMPT_DIR = PROJECT_ROOT / "prompt"
+PROMPT_LOG = PROMPT_DIR / "prompt.md"
+SESSION_LOG = PROMPT_DIR / "sessions.md"
+
+# 是否为每条提示词额外保存单独的备份文件（CLAUDE_PROMPT_BACKUP=0 关闭）；
+# 备份与 prompt.md 条目一样在 hook 中同步写入，只是一个关闭开关：
+# 关闭后每条提示词只写 prompt.md 一次，备份内容可由 analyze_prompts.extract_sessions 重建
+PROMPT_BACKUP = os.getenv('CLAUDE_PROMPT_BACKUP', '1') != '0'
+
+# prompt 目录是否已确认存在（每个进程只检查一次）
+_DIRS_READY = False
+
+
+def ensure_dirs():
+    """确保 prompt 目录存在"""
+    global _DIRS_READY
+
+    if not _DIRS_READY:
+        PROMPT_DIR.mkdir(exist_ok=True)
+        _DIRS_READY = True
+
+
+def json_loads(data):
+    """
+    解析 JSON（接受 str 或 UTF-8 bytes）
+
+    解析失败时抛出 json.JSONDecodeError（orjson.JSONDecodeError 是其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """序列化为缩进 2 格、保留非 ASCII 字符的 JSON，返回 UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def write_log(path, text, append=True):
+    """
+    以单次 write 系统调用写入日志文件
+
+    Args:
+        path: 日志文件路径
+        text: 写入内容
+        append: True 追加写入，False 覆盖写入
+    """
+    ensure_dirs()
+    data = text.encode('utf-8')
+
+    # O_BINARY: Windows 下不做换行转换，日志统一为 LF
+    flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+    flags |= os.O_APPEND if append else os.O_TRUNC
+
+    fd = os.open(path, flags, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
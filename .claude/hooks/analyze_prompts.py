@@ -12,11 +12,15 @@
 
 import os
 import re
-import json
+import mmap
+import hashlib
 import sys
-from pathlib import Path
 from datetime import datetime
-from collections import Counter
+from bisect import bisect_right
+from itertools import accumulate
+from collections import Counter, deque
+
+from _common import PROMPT_DIR, PROMPT_LOG, json_dumps, json_loads
 
 # 修复 Windows 控制台编码问题
 if sys.platform == 'win32':
@@ -24,96 +28,196 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_LOG = PROJECT_ROOT / "prompt" / "prompt.md"
+SESSION_CACHE = PROMPT_DIR / ".sessions.cache"
+
+# 会话缓存格式版本（格式变化时递增，使旧缓存失效）
+_CACHE_VERSION = 3
+# 校验已解析前缀时比对的尾部字节数
+_CACHE_DIGEST_SPAN = 4096
+# 缓存中每条会话必须包含的字段
+_SESSION_KEYS = {'session_id', 'timestamp', 'prompt', 'files'}
+
+# 会话记录匹配模式（模块加载时编译一次，单次 finditer 提取全部字段）
+# 按 UTF-8 字节编译，直接在 mmap 映射的文件内容上匹配；
+# 旧版 hook 在 Windows 下以文本模式写入，日志可能是 CRLF 换行，因此换行一律按 \r?\n 匹配
+_SESSION_RE = re.compile(
+    (
+        r'^## 提示词记录 #(?P<id>\S+)\r?\n'
+        r'\r?\n\*\*时间\*\*:\s*(?P<ts>\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\r?\n'
+        r'(?:\*\*[^\n]*\n)*'
+        r'\r?\n### 用户提示词\r?\n\r?\n```\r?\n(?P<prompt>.*?)\r?\n```\r?\n'
+        r'(?:\r?\n### 上下文文件\r?\n\r?\n(?P<files>.*?)\r?\n\r?\n###)?'
+    ).encode('utf-8'),
+    re.MULTILINE | re.DOTALL
+)
+_FILEREF_RE = re.compile(r'`([^`]+)`')
+
+# 技术关键词
+KEYWORDS = [
+    '信号量', '互斥锁', '调度器', '任务', '内存管理', 'MMU',
+    'IPC', '文件系统', '驱动', '中断', 'ARM64', 'MISRA',
+    'POSIX', 'CMake', 'MenuConfig', '测试', '调试',
+    '锁', '同步', '并发', '多核', 'SMP', '缓存'
+]
+
+# 模块关键词
+MODULE_KEYWORDS = {
+    '内核': ['调度器', '任务', '中断', '异常'],
+    '内存': ['MMU', '内存管理', '页表', '堆', '栈'],
+    '同步': ['信号量', '互斥锁', '锁', '同步', '并发'],
+    'IPC': ['消息队列', '共享内存', '管道', '信号'],
+    '文件系统': ['VFS', '文件', '目录', 'inode'],
+    '驱动': ['驱动', 'GPIO', 'UART', 'SPI', 'I2C'],
+    '网络': ['TCP', 'UDP', 'socket', '网络'],
+    '构建': ['CMake', 'Makefile', '编译', '链接'],
+    '测试': ['测试', '单元测试', '覆盖率', 'Unity'],
+    '安全': ['MISRA', '安全', '认证', 'ASIL']
+}
+_KW_TO_MODULE = {kw: mod for mod, kws in MODULE_KEYWORDS.items() for kw in kws}
+
+# 所有关键词合并为一个前瞻匹配模式，长关键词优先；
+# 同一位置命中的较短关键词（如 '信号量' 中的 '信号'）通过前缀表补齐。
+# 开头的首字符集断言让绝大多数位置只做一次字符集判断即被跳过，不进入分支逐个尝试
+_ALL_KEYWORDS = sorted(set(KEYWORDS) | set(_KW_TO_MODULE), key=lambda kw: (-len(kw), kw))
+_KW_FIRST_CHARS = ''.join(sorted({kw[0] for kw in _ALL_KEYWORDS}))
+_ANY_KW_RE = re.compile(
+    '(?=[' + re.escape(_KW_FIRST_CHARS) + '])'
+    '(?=(' + '|'.join(map(re.escape, _ALL_KEYWORDS)) + '))'
+)
+_KW_PREFIXES = {kw: [k for k in _ALL_KEYWORDS if kw.startswith(k)] for kw in _ALL_KEYWORDS}
+
+
+def _session_from_match(match):
+    """将会话匹配结果转换为字典"""
+    files_text = (match.group('files') or b"").decode('utf-8')
+
+    return {
+        'session_id': match.group('id').decode('utf-8'),
+        'timestamp': match.group('ts').decode('utf-8'),
+        'prompt': match.group('prompt').decode('utf-8').replace('\r\n', '\n'),
+        'files': _FILEREF_RE.findall(files_text)
+    }
 
 
-def extract_sessions():
-    """从 prompt.md 提取所有会话"""
-    content = PROMPT_LOG.read_text(encoding='utf-8')
+def _prefix_digest(mm, size):
+    """计算文件前 size 字节末尾片段的摘要，用于判断已解析部分是否被改写"""
+    return hashlib.blake2b(mm[max(0, size - _CACHE_DIGEST_SPAN):size], digest_size=16).hexdigest()
 
-    # 按分隔符分割会话
-    sessions = content.split('---\n\n## 提示词记录 #')
 
-    results = []
+def _load_cache():
+    """读取会话缓存，缓存不存在、损坏或格式不符时返回 None（调用方完整重新解析）"""
+    try:
+        with open(SESSION_CACHE, 'rb') as f:
+            cache = json_loads(f.read())
+    except (OSError, ValueError):
+        return None
 
-    for session in sessions[1:]:  # 跳过第一个空会话
-        try:
-            # 提取会话ID
-            session_id = session.split('\n')[0].strip('#')
+    if not isinstance(cache, dict) or cache.get('version') != _CACHE_VERSION:
+        return None
+    if not (isinstance(cache.get('size'), int) and isinstance(cache.get('mtime_ns'), int) and
+            isinstance(cache.get('parsed_end'), int) and isinstance(cache.get('digest'), str) and
+            isinstance(cache.get('sessions'), list)):
+        return None
+    if not all(isinstance(session, dict) and _SESSION_KEYS <= session.keys()
+               for session in cache['sessions']):
+        return None
+    return cache
 
-            # 提取时间戳
-            time_match = re.search(r'\*\*时间\*\*:\s*(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', session)
-            timestamp = time_match.group(1) if time_match else "unknown"
 
-            # 提取提示词内容
-            prompt_match = re.search(r'### 用户提示词\n\n```\n(.+?)\n```', session, re.DOTALL)
-            prompt_text = prompt_match.group(1) if prompt_match else ""
+def _save_cache(cache):
+    """写入会话缓存（先写临时文件再替换，避免留下半写的缓存）"""
+    tmp_path = SESSION_CACHE.with_suffix('.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(json_dumps(cache))
+        os.replace(tmp_path, SESSION_CACHE)
+    except OSError as e:
+        print(f"[WARN] 写入会话缓存失败: {e}")
 
-            # 提取上下文文件
-            files_match = re.search(r'### 上下文文件\n\n(.+?)\n\n###', session, re.DOTALL)
-            files_text = files_match.group(1) if files_match else ""
-            files = re.findall(r'`([^`]+)`', files_text)
 
-            results.append({
-                'session_id': session_id,
-                'timestamp': timestamp,
-                'prompt': prompt_text,
-                'files': files
+def extract_sessions():
+    """
+    从 prompt.md 提取所有会话（生成器）
+
+    prompt.md 只追加写入，解析结果缓存在 .sessions.cache 中；
+    文件未变化时直接返回缓存，文件增长且已解析部分未改写时只解析新增尾部。
+    """
+    with open(PROMPT_LOG, 'rb') as f:
+        st = os.fstat(f.fileno())
+
+        # 空文件无法 mmap
+        if st.st_size == 0:
+            return
+
+        cache = _load_cache()
+        if cache and cache['size'] == st.st_size and cache['mtime_ns'] == st.st_mtime_ns:
+            yield from cache['sessions']
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sessions = []
+            parsed_end = 0
+
+            if (cache and cache['size'] < st.st_size and
+                    cache['digest'] == _prefix_digest(mm, cache['size'])):
+                sessions = cache['sessions']
+                parsed_end = cache['parsed_end']
+                yield from sessions
+
+            for match in _SESSION_RE.finditer(mm, parsed_end):
+                session = _session_from_match(match)
+                sessions.append(session)
+                parsed_end = match.end()
+                yield session
+
+            _save_cache({
+                'version': _CACHE_VERSION,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'digest': _prefix_digest(mm, st.st_size),
+                'parsed_end': parsed_end,
+                'sessions': sessions
             })
-        except Exception as e:
-            print(f"[WARN] 解析会话失败: {e}")
-            continue
 
-    return results
 
+def scan_keywords(text):
+    """单次扫描文本，返回各关键词的出现次数"""
+    hits = Counter()
 
-def analyze_keywords(sessions):
-    """分析关键词"""
-    all_text = ' '.join([s['prompt'] for s in sessions])
+    for keyword, count in Counter(_ANY_KW_RE.findall(text)).items():
+        for prefix in _KW_PREFIXES[keyword]:
+            hits[prefix] += count
 
-    # 定义技术关键词
-    keywords = [
-        '信号量', '互斥锁', '调度器', '任务', '内存管理', 'MMU',
-        'IPC', '文件系统', '驱动', '中断', 'ARM64', 'MISRA',
-        'POSIX', 'CMake', 'MenuConfig', '测试', '调试',
-        '锁', '同步', '并发', '多核', 'SMP', '缓存'
-    ]
+    return hits
 
-    keyword_counts = Counter()
 
-    for keyword in keywords:
-        count = all_text.count(keyword)
-        if count > 0:
-            keyword_counts[keyword] = count
+def analyze_keywords(prompts):
+    """分析关键词"""
+    all_text = ' '.join(prompts)
+    hits = scan_keywords(all_text)
+
+    keyword_counts = Counter({kw: hits[kw] for kw in KEYWORDS if hits[kw] > 0})
 
     return keyword_counts.most_common()
 
 
-def categorize_by_module(sessions):
+def categorize_by_module(prompts):
     """按模块分类"""
-    modules = {
-        '内核': ['调度器', '任务', '中断', '异常'],
-        '内存': ['MMU', '内存管理', '页表', '堆', '栈'],
-        '同步': ['信号量', '互斥锁', '锁', '同步', '并发'],
-        'IPC': ['消息队列', '共享内存', '管道', '信号'],
-        '文件系统': ['VFS', '文件', '目录', 'inode'],
-        '驱动': ['驱动', 'GPIO', 'UART', 'SPI', 'I2C'],
-        '网络': ['TCP', 'UDP', 'socket', '网络'],
-        '构建': ['CMake', 'Makefile', '编译', '链接'],
-        '测试': ['测试', '单元测试', '覆盖率', 'Unity'],
-        '安全': ['MISRA', '安全', '认证', 'ASIL']
-    }
+    module_counts = {module: 0 for module in MODULE_KEYWORDS.keys()}
 
-    module_counts = {module: 0 for module in modules.keys()}
+    # 所有提示词以 '\0' 拼接成一个语料单次扫描，再按偏移量映射回所属会话
+    corpus = '\0'.join(prompts)
+    ends = list(accumulate(len(prompt) + 1 for prompt in prompts))
 
-    for session in sessions:
-        prompt = session['prompt']
+    hits = set()
+    for match in _ANY_KW_RE.finditer(corpus):
+        index = bisect_right(ends, match.start())
+        for keyword in _KW_PREFIXES[match.group(1)]:
+            if keyword in _KW_TO_MODULE:
+                hits.add((index, _KW_TO_MODULE[keyword]))
 
-        for module, keywords in modules.items():
-            if any(keyword in prompt for keyword in keywords):
-                module_counts[module] += 1
+    for _, module in hits:
+        module_counts[module] += 1
 
     # 移除计数为0的模块
     return {k: v for k, v in module_counts.items() if v > 0}
@@ -126,34 +230,46 @@ def generate_report():
         return
 
     print("[INFO] 正在分析提示词记录...")
-    sessions = extract_sessions()
 
-    if not sessions:
+    # 流式遍历会话：最近会话只保留 5 个，文件引用边遍历边计数，
+    # 只有关键词统计需要的提示词文本被保留
+    session_count = 0
+    first_time = last_time = None
+    recent = deque(maxlen=5)
+    file_counts = Counter()
+    prompts = []
+
+    for session in extract_sessions():
+        session_count += 1
+        if first_time is None:
+            first_time = session['timestamp']
+        last_time = session['timestamp']
+        recent.append(session)
+        file_counts.update(session['files'])
+        prompts.append(session['prompt'])
+
+    if session_count == 0:
         print("⚠️  未找到会话记录")
         return
 
-    print(f"\n✅ 找到 {len(sessions)} 个会话\n")
+    print(f"\n✅ 找到 {session_count} 个会话\n")
     print("=" * 60)
 
     # 1. 基本信息
     print("\n[STATS] 基本信息")
-    print(f"  总提示词数: {len(sessions)}")
-
-    if sessions:
-        first_time = sessions[0]['timestamp']
-        last_time = sessions[-1]['timestamp']
-        print(f"  时间范围: {first_time} ~ {last_time}")
+    print(f"  总提示词数: {session_count}")
+    print(f"  时间范围: {first_time} ~ {last_time}")
 
     # 2. 关键词统计
     print("\n[KEYWORDS] 热门关键词")
-    keywords = analyze_keywords(sessions)
+    keywords = analyze_keywords(prompts)
     for keyword, count in keywords[:10]:
         bar = '█' * (count // 2 + 1)
         print(f"  {keyword:12s} {bar} ({count})")
 
     # 3. 模块分布
     print("\n[MODULES] 按模块分类")
-    modules = categorize_by_module(sessions)
+    modules = categorize_by_module(prompts)
     total = sum(modules.values())
     for module, count in sorted(modules.items(), key=lambda x: x[1], reverse=True):
         percent = (count / total * 100) if total > 0 else 0
@@ -161,18 +277,13 @@ def generate_report():
 
     # 4. 最近会话
     print("\n[RECENT] 最近 5 个会话")
-    for session in sessions[-5:]:
+    for session in recent:
         prompt_preview = session['prompt'][:40].replace('\n', ' ')
         print(f"  [{session['timestamp']}] {prompt_preview}...")
 
     # 5. 文件引用统计
     print("\n[FILES] 最常引用的文件")
-    all_files = []
-    for session in sessions:
-        all_files.extend(session['files'])
-
-    file_counts = Counter(all_files).most_common(10)
-    for file, count in file_counts:
+    for file, count in file_counts.most_common(10):
         print(f"  {count:2d}x {file}")
 
     print("\n" + "=" * 60)
@@ -181,10 +292,10 @@ def generate_report():
 
 def export_json(output_file=None):
     """导出为 JSON 格式"""
-    sessions = extract_sessions()
+    sessions = list(extract_sessions())
 
     if output_file is None:
-        output_file = PROJECT_ROOT / "prompt" / "prompts_export.json"
+        output_file = PROMPT_DIR / "prompts_export.json"
 
     data = {
         'export_time': datetime.now().isoformat(),
@@ -192,8 +303,8 @@ def export_json(output_file=None):
         'sessions': sessions
     }
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(json_dumps(data))
 
     print(f"[OK] 已导出到: {output_file}")
 
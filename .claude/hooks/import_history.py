@@ -12,11 +12,47 @@ import sys
 import re
 from pathlib import Path
 from datetime import datetime
+from contextlib import nullcontext
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-PROMPT_LOG = PROMPT_DIR / "prompt.md"
+from _common import PROJECT_ROOT, PROMPT_DIR, PROMPT_LOG, ensure_dirs
+
+# 用户提示词块：以 "> " 开头的行，连同其后的续行；
+# 遇到空行、"●" 开头的响应行或下一个 "> " 行时结束
+_PROMPT_BLOCK_RE = re.compile(r'^> ([^\n]*(?:\n(?!> |●|\s*$)[^\n]*)*)', re.MULTILINE)
+
+
+# 导入条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""---
+## 提示词记录 #$session_id
+
+**时间**: $timestamp
+**会话类型**: import
+**模型**: unknown
+**工作目录**: `D:\\AI\\homework\\ClaudeCode\\AISafeOS64`
+**来源文件**: `$source_file`
+
+### 用户提示词
+
+```
+$text
+```
+
+### 会话元数据
+
+```json
+{
+  "session_id": "$session_id",
+  "timestamp": "$timestamp",
+  "model": "unknown",
+  "source_file": "$source_file",
+  "imported_at": "$imported_at"
+}
+```
+
+---
+
+""")
 
 
 def parse_session_file(file_path):
@@ -31,38 +67,16 @@ def parse_session_file(file_path):
     """
     content = file_path.read_text(encoding='utf-8')
 
-    prompts = []
-
-    # 提取用户输入（以 "> " 开头的行）
-    current_prompt = []
-    in_prompt = False
-
-    for line in content.split('\n'):
-        # 检测用户提示词开始
-        if line.startswith('> '):
-            if current_prompt:
-                prompts.append('\n'.join(current_prompt))
-            current_prompt = [line[2:]]  # 去掉 "> " 前缀
-            in_prompt = True
-        elif in_prompt:
-            if line.strip() and not line.startswith('●'):
-                # 继续追加多行提示词
-                current_prompt.append(line)
-            else:
-                # 提示词结束
-                if current_prompt:
-                    prompts.append('\n'.join(current_prompt))
-                current_prompt = []
-                in_prompt = False
-
-    # 处理最后一个提示词
-    if current_prompt:
-        prompts.append('\n'.join(current_prompt))
-
-    return prompts
-
-
-def import_prompt(text, timestamp, source_file):
+    return [match.group(1) for match in _PROMPT_BLOCK_RE.finditer(content)]
+
+
+def open_prompt_log():
+    """以追加模式打开 prompt.md（1 MB 用户态缓冲，批量写入时合并系统调用）"""
+    ensure_dirs()
+    return open(PROMPT_LOG, 'a', encoding='utf-8', newline='\n', buffering=1 << 20)
+
+
+def import_prompt(text, timestamp, source_file, imported_at=None, fh=None):
     """
     导入单个提示词到 prompt.md
 
@@ -70,54 +84,41 @@ def import_prompt(text, timestamp, source_file):
         text: 提示词内容
         timestamp: 时间戳
         source_file: 来源文件名
+        imported_at: 导入时间字符串（批量导入时由调用方计算一次）
+        fh: 已打开的 prompt.md 文件句柄（批量导入时复用），为 None 时单独打开
     """
+    if imported_at is None:
+        imported_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
     # 生成会话ID（基于文件名和时间戳）
     session_id = timestamp.strftime("%Y%m%d-%H%M%S")
 
-    entry = f"""---
-## 提示词记录 #{session_id}
-
-**时间**: {timestamp.strftime("%Y-%m-%d %H:%M:%S")}
-**会话类型**: import
-**模型**: unknown
-**工作目录**: `D:\\AI\\homework\\ClaudeCode\\AISafeOS64`
-**来源文件**: `{source_file}`
-
-### 用户提示词
-
-```
-{text}
-```
-
-### 会话元数据
-
-```json
-{{
-  "session_id": "{session_id}",
-  "timestamp": "{timestamp.strftime("%Y-%m-%d %H:%M:%S")}",
-  "model": "unknown",
-  "source_file": "{source_file}",
-  "imported_at": "{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}"
-}}
-```
-
----
-
-"""
+    entry = _ENTRY_TMPL.substitute(
+        session_id=session_id,
+        timestamp=timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        source_file=source_file,
+        text=text,
+        imported_at=imported_at
+    )
 
     # 追加到文件
-    with open(PROMPT_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
+    if fh is None:
+        with open_prompt_log() as f:
+            f.write(entry)
+    else:
+        fh.write(entry)
 
     print(f"✅ 导入提示词: {text[:50]}...")
 
 
-def import_file(file_path):
+def import_file(file_path, imported_at=None, fh=None):
     """
     导入单个历史文件
 
     Args:
         file_path: 文件路径
+        imported_at: 导入时间字符串（批量导入时由调用方计算一次）
+        fh: 已打开的 prompt.md 文件句柄（批量导入时复用），为 None 时单独打开
     """
     print(f"\n📄 处理文件: {file_path.name}")
 
@@ -143,12 +144,16 @@ def import_file(file_path):
         print(f"⚠️  未找到提示词")
         return 0
 
-    # 导入每个提示词
+    if imported_at is None:
+        imported_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # 导入每个提示词（同一文件的所有提示词共用一个文件句柄）
     count = 0
-    for i, prompt in enumerate(prompts, 1):
-        if prompt.strip():
-            import_prompt(prompt, timestamp, file_path.name)
-            count += 1
+    with (nullcontext(fh) if fh is not None else open_prompt_log()) as log:
+        for i, prompt in enumerate(prompts, 1):
+            if prompt.strip():
+                import_prompt(prompt, timestamp, file_path.name, imported_at, log)
+                count += 1
 
     print(f"✅ 完成：导入 {count} 个提示词")
     return count
@@ -170,10 +175,15 @@ def import_all():
 
     print(f"📁 找到 {len(txt_files)} 个历史文件\n")
 
+    # 整批导入共用同一个导入时间
+    imported_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # 整批导入只打开一次 prompt.md
     total_count = 0
-    for file_path in sorted(txt_files):
-        count = import_file(file_path)
-        total_count += count
+    with open_prompt_log() as fh:
+        for file_path in sorted(txt_files):
+            count = import_file(file_path, imported_at, fh)
+            total_count += count
 
     print(f"\n✅ 总计导入 {total_count} 个提示词")
     return total_count
@@ -10,15 +10,57 @@ import os
 import sys
 import json
 from datetime import datetime
-from pathlib import Path
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-PROMPT_LOG = PROMPT_DIR / "prompt.md"
+from _common import (
+    PROJECT_ROOT, PROMPT_DIR, PROMPT_LOG, PROMPT_BACKUP,
+    json_dumps, json_loads, write_log
+)
 
-# 确保目录存在
-PROMPT_DIR.mkdir(exist_ok=True)
+# Markdown 转义表（模块加载时构建一次）
+_ESCAPE_TABLE = str.maketrans({c: '\\' + c for c in '\\`*_{}[]()#+-.!'})
+
+# prompt.md 条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""---
+## 提示词记录 #$session_id
+
+**时间**: $timestamp
+**会话类型**: $session_type
+**模型**: $model
+**工作目录**: `$working_dir`
+
+### 用户提示词
+
+```
+$user_message
+```
+
+### 上下文文件
+
+$files_list
+
+### 会话元数据
+
+```json
+$metadata
+```
+
+---
+
+""")
+
+# 单独备份文件模板
+_BACKUP_TMPL = Template("""# Claude Code 提示词记录
+
+**时间**: $timestamp
+**会话ID**: $session_id
+**模型**: $model
+
+## 提示词
+
+$user_message
+
+$files_section""")
 
 
 def format_timestamp():
@@ -27,11 +69,13 @@ def format_timestamp():
 
 
 def escape_markdown(text):
-    """转义 Markdown 特殊字符"""
-    special_chars = ['\\', '`', '*', '_', '{', '}', '[', ']', '(', ')', '#', '+', '-', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, '\\' + char)
-    return text
+    """
+    转义 Markdown 特殊字符
+
+    仅用于行内文本。提示词写在 ``` 围栏代码块中，围栏内不解析 Markdown，
+    转义产生的反斜杠会原样出现在记录里，因此条目模板不调用本函数。
+    """
+    return text.translate(_ESCAPE_TABLE)
 
 
 def format_files_list(files):
@@ -72,55 +116,42 @@ def append_prompt_log(user_message, context_files=None, session_info=None):
     working_dir = session_info.get('working_dir', str(PROJECT_ROOT))
     session_type = session_info.get('session_type', 'new')  # new, resume
 
-    # 构建 Markdown 条目
-    entry = f"""---
-## 提示词记录 #{session_id}
-
-**时间**: {timestamp}
-**会话类型**: {session_type}
-**模型**: {model}
-**工作目录**: `{working_dir}`
-
-### 用户提示词
-
-```
-{user_message}
-```
-
-### 上下文文件
-
-{format_files_list(context_files or [])}
-
-### 会话元数据
+    # 会话元数据（序列化保证路径中的反斜杠、引号被正确转义）
+    metadata = json_dumps({
+        'session_id': session_id,
+        'timestamp': timestamp,
+        'model': model,
+        'working_dir': working_dir,
+        'context_file_count': len(context_files) if context_files else 0
+    }).decode('utf-8')
 
-```json
-{{
-  "session_id": "{session_id}",
-  "timestamp": "{timestamp}",
-  "model": "{model}",
-  "working_dir": "{working_dir}",
-  "context_file_count": {len(context_files) if context_files else 0}
-}}
-```
+    # 构建 Markdown 条目
+    files_list = format_files_list(context_files or [])
+    entry = _ENTRY_TMPL.substitute(
+        session_id=session_id,
+        timestamp=timestamp,
+        session_type=session_type,
+        model=model,
+        working_dir=working_dir,
+        user_message=user_message,
+        files_list=files_list,
+        metadata=metadata
+    )
 
----
+    # 追加到文件
+    write_log(PROMPT_LOG, entry)
 
-"""
+    # 同时保存单独的提示词文件（备份，CLAUDE_PROMPT_BACKUP=0 时跳过）
+    if PROMPT_BACKUP:
+        backup = _BACKUP_TMPL.substitute(
+            timestamp=timestamp,
+            session_id=session_id,
+            model=model,
+            user_message=user_message,
+            files_section=f"## 上下文文件\n\n{files_list}\n\n" if context_files else ""
+        )
 
-    # 追加到文件
-    with open(PROMPT_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
-
-    # 同时保存单独的提示词文件（备份）
-    individual_log = PROMPT_DIR / f"{session_id}.txt"
-    with open(individual_log, 'w', encoding='utf-8') as f:
-        f.write(f"# Claude Code 提示词记录\n\n")
-        f.write(f"**时间**: {timestamp}\n")
-        f.write(f"**会话ID**: {session_id}\n")
-        f.write(f"**模型**: {model}\n\n")
-        f.write(f"## 提示词\n\n{user_message}\n\n")
-        if context_files:
-            f.write(f"## 上下文文件\n\n{format_files_list(context_files)}\n\n")
+        write_log(PROMPT_DIR / f"{session_id}.txt", backup, append=False)
 
     return session_id
 
@@ -135,7 +166,7 @@ def main():
 
     # 解析上下文文件
     try:
-        context_files = json.loads(context_files_json)
+        context_files = json_loads(context_files_json)
     except json.JSONDecodeError:
         context_files = []
 
@@ -9,12 +9,8 @@ Claude Code Hook: 记录 AI 响应到 prompt/prompt.md
 import os
 import sys
 from datetime import datetime
-from pathlib import Path
-
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_LOG = PROJECT_ROOT / "prompt" / "prompt.md"
 
+from _common import PROMPT_LOG, write_log
 
 def format_timestamp():
     """格式化时间戳"""
@@ -56,8 +52,7 @@ def append_response_log(session_id, response_content, tool_calls=None):
 """
 
     # 追加到文件
-    with open(PROMPT_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
+    write_log(PROMPT_LOG, entry)
 
     return 0
 
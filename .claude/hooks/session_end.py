@@ -10,12 +10,21 @@ Claude Code Hook: SessionEnd
 import sys
 import json
 from datetime import datetime
-from pathlib import Path
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-SESSION_LOG = PROMPT_DIR / "sessions.md"
+from _common import SESSION_LOG, json_loads, write_log
+
+# 会话结束条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""### 会话结束
+
+**结束时间**: $timestamp
+**持续时间**: $duration
+**提示词数量**: $prompt_count
+**工具调用次数**: $tool_use_count
+
+---
+
+""")
 
 
 def handle_hook(event_data):
@@ -46,20 +55,15 @@ def handle_hook(event_data):
         duration = f"{duration_seconds}s"
 
     # 构建日志条目
-    entry = f"""### 会话结束
-
-**结束时间**: {timestamp}
-**持续时间**: {duration}
-**提示词数量**: {prompt_count}
-**工具调用次数**: {tool_use_count}
-
----
-
-"""
+    entry = _ENTRY_TMPL.substitute(
+        timestamp=timestamp,
+        duration=duration,
+        prompt_count=prompt_count,
+        tool_use_count=tool_use_count
+    )
 
     # 追加到文件
-    with open(SESSION_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
+    write_log(SESSION_LOG, entry)
 
     return None
 
@@ -67,7 +71,7 @@ def handle_hook(event_data):
 def main():
     """主函数"""
     try:
-        input_data = json.loads(sys.stdin.read())
+        input_data = json_loads(sys.stdin.buffer.read())
         result = handle_hook(input_data)
 
         if result:
@@ -10,15 +10,32 @@ Claude Code Hook: SessionStart
 import sys
 import json
 from datetime import datetime
-from pathlib import Path
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-SESSION_LOG = PROMPT_DIR / "sessions.md"
+from _common import PROJECT_ROOT, SESSION_LOG, json_loads, write_log
 
-# 确保目录存在
-PROMPT_DIR.mkdir(exist_ok=True)
+# sessions.md 文件头
+_LOG_HEADER = """# Claude Code 会话日志
+
+> 本文件记录所有 Claude Code 会话的开始和结束
+
+---
+
+"""
+
+# 会话开始条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""---
+## 会话开始 - $session_short_id
+
+**时间**: $timestamp
+**会话ID**: $session_id
+**会话类型**: $session_type
+**模型**: $model
+**工作目录**: `$working_dir`
+
+---
+
+""")
 
 
 def handle_hook(event_data):
@@ -43,29 +60,21 @@ def handle_hook(event_data):
     session_type = "恢复会话" if is_resume else "新会话"
 
     # 构建日志条目
-    entry = f"""---
-## 会话开始 - {session_short_id}
-
-**时间**: {timestamp}
-**会话ID**: {session_id}
-**会话类型**: {session_type}
-**模型**: {model}
-**工作目录**: `{working_dir}`
-
----
-
-"""
-
-    # 如果是第一次运行，创建文件头
+    entry = _ENTRY_TMPL.substitute(
+        session_short_id=session_short_id,
+        timestamp=timestamp,
+        session_id=session_id,
+        session_type=session_type,
+        model=model,
+        working_dir=working_dir
+    )
+
+    # 如果是第一次运行，在条目前加上文件头
     if not SESSION_LOG.exists():
-        with open(SESSION_LOG, 'w', encoding='utf-8') as f:
-            f.write("# Claude Code 会话日志\n\n")
-            f.write("> 本文件记录所有 Claude Code 会话的开始和结束\n\n")
-            f.write("---\n\n")
+        entry = _LOG_HEADER + entry
 
     # 追加到文件
-    with open(SESSION_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
+    write_log(SESSION_LOG, entry)
 
     return None
 
@@ -74,7 +83,7 @@ def main():
     """主函数"""
     try:
         # 从标准输入读取 JSON 数据
-        input_data = json.loads(sys.stdin.read())
+        input_data = json_loads(sys.stdin.buffer.read())
 
         # 处理事件
         result = handle_hook(input_data)
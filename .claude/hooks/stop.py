@@ -10,12 +10,17 @@ Claude Code Hook: Stop
 import sys
 import json
 from datetime import datetime
-from pathlib import Path
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-PROMPT_LOG = PROMPT_DIR / "prompt.md"
+from _common import PROMPT_LOG, json_loads, write_log
+
+# 响应摘要条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""### AI 响应
+
+**完成时间**: $timestamp
+**使用工具**: $tools_summary
+
+""")
 
 
 def handle_hook(event_data):
@@ -44,15 +49,9 @@ def handle_hook(event_data):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # 追加到 prompt.md（在对应的提示词记录后）
-    entry = f"""### AI 响应
-
-**完成时间**: {timestamp}
-**使用工具**: {tools_summary}
-
-"""
+    entry = _ENTRY_TMPL.substitute(timestamp=timestamp, tools_summary=tools_summary)
 
-    with open(PROMPT_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
+    write_log(PROMPT_LOG, entry)
 
     return None
 
@@ -60,7 +59,7 @@ def handle_hook(event_data):
 def main():
     """主函数"""
     try:
-        input_data = json.loads(sys.stdin.read())
+        input_data = json_loads(sys.stdin.buffer.read())
         result = handle_hook(input_data)
 
         if result:
@@ -10,22 +10,33 @@
 import sys
 import json
 import subprocess
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import PROJECT_ROOT
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
 HOOKS_DIR = PROJECT_ROOT / ".claude" / "hooks"
 
+# 按写入的日志文件分组：同组 hook 有先后依赖（session_start 在 sessions.md 不存在时写文件头，
+# stop 的响应块必须跟在 user_prompt_submit 的提示词条目之后），组内串行、组间并发
+LOG_GROUPS = (
+    ("session_start.py", "session_end.py"),  # sessions.md
+    ("user_prompt_submit.py", "stop.py"),  # prompt.md
+)
+
 
 def test_hook(hook_name, test_data):
-    """测试单个 Hook"""
+    """
+    测试单个 Hook
+
+    Returns:
+        tuple: (是否通过, 测试输出文本)；输出由调用方统一打印，避免并发运行时交错
+    """
     hook_script = HOOKS_DIR / hook_name
 
     if not hook_script.exists():
-        print(f"[SKIP] {hook_name} 不存在")
-        return False
+        return False, f"[SKIP] {hook_name} 不存在"
 
-    print(f"\n[TEST] 测试 {hook_name}...")
+    lines = [f"\n[TEST] 测试 {hook_name}..."]
 
     try:
         # 运行 hook 脚本
@@ -38,22 +49,22 @@ def test_hook(hook_name, test_data):
         )
 
         if result.returncode == 0:
-            print(f"[OK] {hook_name} 执行成功")
+            lines.append(f"[OK] {hook_name} 执行成功")
             if result.stdout:
-                print(f"  输出: {result.stdout[:100]}")
-            return True
+                lines.append(f"  输出: {result.stdout[:100]}")
+            return True, "\n".join(lines)
         else:
-            print(f"[FAIL] {hook_name} 返回错误码 {result.returncode}")
+            lines.append(f"[FAIL] {hook_name} 返回错误码 {result.returncode}")
             if result.stderr:
-                print(f"  错误: {result.stderr}")
-            return False
+                lines.append(f"  错误: {result.stderr}")
+            return False, "\n".join(lines)
 
     except subprocess.TimeoutExpired:
-        print(f"[FAIL] {hook_name} 超时")
-        return False
+        lines.append(f"[FAIL] {hook_name} 超时")
+        return False, "\n".join(lines)
     except Exception as e:
-        print(f"[FAIL] {hook_name} 执行失败: {e}")
-        return False
+        lines.append(f"[FAIL] {hook_name} 执行失败: {e}")
+        return False, "\n".join(lines)
 
 
 def main():
@@ -108,12 +119,24 @@ def main():
         )
     ]
 
-    # 运行所有测试
+    def run_group(hooks):
+        """按 tests 中的顺序串行运行一组 hook"""
+        return {name: test_hook(name, data) for name, data in tests if name in hooks}
+
+    # 各组写不同的日志文件，可以并发运行（主要耗时在子进程解释器启动）
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(LOG_GROUPS)) as executor:
+        for group_results in executor.map(run_group, LOG_GROUPS):
+            results.update(group_results)
+
+    # 按测试顺序输出结果
     passed = 0
     failed = 0
 
-    for hook_name, test_data in tests:
-        if test_hook(hook_name, test_data):
+    for name, _ in tests:
+        ok, report = results[name]
+        print(report)
+        if ok:
             passed += 1
         else:
             failed += 1
@@ -10,15 +10,54 @@ Claude Code Hook: UserPromptSubmit
 import sys
 import json
 from datetime import datetime
-from pathlib import Path
+from string import Template
 
-# 项目根目录
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-PROMPT_DIR = PROJECT_ROOT / "prompt"
-PROMPT_LOG = PROMPT_DIR / "prompt.md"
+from _common import (
+    PROJECT_ROOT, PROMPT_DIR, PROMPT_LOG, PROMPT_BACKUP,
+    json_dumps, json_loads, write_log
+)
 
-# 确保目录存在
-PROMPT_DIR.mkdir(exist_ok=True)
+# prompt.md 条目模板（模块加载时构建一次）
+_ENTRY_TMPL = Template("""---
+## 提示词记录 #$session_short_id
+
+**时间**: $timestamp
+**会话ID**: $session_id
+**模型**: $model
+**工作目录**: `$working_dir`
+
+### 用户提示词
+
+```
+$prompt_content
+```
+
+### 上下文文件
+
+$files_list
+
+### 会话元数据
+
+```json
+$metadata
+```
+
+---
+
+""")
+
+# 单独备份文件模板
+_BACKUP_TMPL = Template("""# Claude Code 提示词记录
+
+**时间**: $timestamp
+**会话ID**: $session_id
+**模型**: $model
+
+## 提示词
+
+$prompt_content
+
+$files_section""")
 
 
 def handle_hook(event_data):
@@ -55,55 +94,41 @@ def handle_hook(event_data):
                 files_formatted.append(f"- `{path}`")
         files_list = "\n".join(files_formatted)
 
-    # 构建 Markdown 条目
-    entry = f"""---
-## 提示词记录 #{session_short_id}
-
-**时间**: {timestamp}
-**会话ID**: {session_id}
-**模型**: {model}
-**工作目录**: `{working_dir}`
-
-### 用户提示词
-
-```
-{prompt_content}
-```
-
-### 上下文文件
-
-{files_list}
-
-### 会话元数据
+    # 会话元数据（序列化保证路径中的反斜杠、引号被正确转义）
+    metadata = json_dumps({
+        'session_id': session_id,
+        'timestamp': timestamp,
+        'model': model,
+        'working_dir': working_dir,
+        'context_file_count': len(context_files)
+    }).decode('utf-8')
 
-```json
-{{
-  "session_id": "{session_id}",
-  "timestamp": "{timestamp}",
-  "model": "{model}",
-  "working_dir": "{working_dir}",
-  "context_file_count": {len(context_files)}
-}}
-```
+    # 构建 Markdown 条目
+    entry = _ENTRY_TMPL.substitute(
+        session_short_id=session_short_id,
+        timestamp=timestamp,
+        session_id=session_id,
+        model=model,
+        working_dir=working_dir,
+        prompt_content=prompt_content,
+        files_list=files_list,
+        metadata=metadata
+    )
 
----
+    # 追加到文件
+    write_log(PROMPT_LOG, entry)
 
-"""
+    # 同时保存单独的备份文件（CLAUDE_PROMPT_BACKUP=0 时跳过）
+    if PROMPT_BACKUP:
+        backup = _BACKUP_TMPL.substitute(
+            timestamp=timestamp,
+            session_id=session_id,
+            model=model,
+            prompt_content=prompt_content,
+            files_section=f"## 上下文文件\n\n{files_list}\n\n" if context_files else ""
+        )
 
-    # 追加到文件
-    with open(PROMPT_LOG, 'a', encoding='utf-8') as f:
-        f.write(entry)
-
-    # 同时保存单独的备份文件
-    individual_log = PROMPT_DIR / f"{session_short_id}.txt"
-    with open(individual_log, 'w', encoding='utf-8') as f:
-        f.write(f"# Claude Code 提示词记录\n\n")
-        f.write(f"**时间**: {timestamp}\n")
-        f.write(f"**会话ID**: {session_id}\n")
-        f.write(f"**模型**: {model}\n\n")
-        f.write(f"## 提示词\n\n{prompt_content}\n\n")
-        if context_files:
-            f.write(f"## 上下文文件\n\n{files_list}\n\n")
+        write_log(PROMPT_DIR / f"{session_short_id}.txt", backup, append=False)
 
     # 不需要修改行为，返回 None 或空字典
     return None
@@ -113,7 +138,7 @@ def main():
     """主函数：从 stdin 读取 JSON 数据"""
     try:
         # 从标准输入读取 JSON 数据
-        input_data = json.loads(sys.stdin.read())
+        input_data = json_loads(sys.stdin.buffer.read())
 
         # 处理事件
         result = handle_hook(input_data)
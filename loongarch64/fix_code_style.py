@@ -5,9 +5,13 @@
 用于批量修改 LoongArch64 目录下所有 .c 文件的代码风格
 """
 
+import hashlib
+import json
+import mmap
 import os
 import re
 import sys
+from functools import lru_cache
 
 # 需要处理的文件列表
 FILES = [
@@ -35,159 +39,286 @@ FILES = [
     "backtrace.c"
 ]
 
+# 指纹缓存：记录上次处理后各文件内容的摘要，内容未变的文件直接跳过
+CACHE_FILE = ".style-cache.json"
+
+# 不小于该大小的文件通过 mmap 读取，避免整块拷贝；小文件直接 read() 更快
+MMAP_THRESHOLD = 8 * 1024
+
+# 注释分隔符关键词 -> 新格式分隔符（按优先级排列，编码为 UTF-8 字节以直接匹配文件内容）
+_COMMENT_KEYWORDS = {k.encode('utf-8'): v.encode('utf-8') for k, v in {
+    '头 文 件': '/*************************** 头文件包含 ****************************/',
+    '外部函数声明': '/*************************** 外部函数声明 ****************************/',
+    '外部声明': '/*************************** 外部声明 ****************************/',
+    '宏 定 义': '/*************************** 宏定义 ****************************/',
+    '类型定义': '/*************************** 类型定义 ****************************/',
+    '全局变量': '/*************************** 全局变量 ****************************/',
+    '模块变量': '/*************************** 模块变量 ****************************/',
+    '前向声明': '/*************************** 前向声明 ****************************/',
+    '函数实现': '/*************************** 函数实现 ****************************/',
+}.items()}
+
+@lru_cache(maxsize=None)
+def _comment_pattern(keywords):
+    """将文件中出现的关键词合并为一个模式，单次扫描完成替换（按关键词组合缓存编译结果）"""
+    return re.compile(rb'/\*.*(?:' + b'|'.join(map(re.escape, keywords)) + rb').*\*/')
+
+def _comment_replacement(match):
+    """返回匹配到的注释对应的新分隔符；同一注释含多个关键词时取优先级最高者"""
+    text = match.group(0)
+    for keyword, replacement in _COMMENT_KEYWORDS.items():
+        if keyword in text:
+            return replacement
+    return text
+
+def _splice(content, edits):
+    """按 (起始, 结束, 替换内容) 列表修改 content，返回 (新内容, 修改处数)"""
+    if not edits:
+        return content, 0
+    pieces = []
+    prev = 0
+    for start, end, replacement in edits:
+        pieces.append(content[prev:start])
+        pieces.append(replacement)
+        prev = end
+    pieces.append(content[prev:])
+    return b''.join(pieces), len(edits)
+
+def _fix_comment_separators(content):
+    """修复注释分隔符格式，返回 (新内容, 修改处数)"""
+    # 预过滤：只用文件中实际出现的关键词构造模式，一个都没有时无需正则扫描
+    # （find 同时适用于 bytes 和 mmap）
+    keywords = tuple(keyword for keyword in _COMMENT_KEYWORDS if content.find(keyword) != -1)
+    if not keywords:
+        return content, 0
+    # 已是新格式的分隔符替换后不变，不计入修改
+    edits = []
+    for match in _comment_pattern(keywords).finditer(content):
+        replacement = _comment_replacement(match)
+        if replacement != match.group(0):
+            edits.append((match.start(), match.end(), replacement))
+    return _splice(content, edits)
+
 def fix_comment_separators(content):
     """修复注释分隔符格式"""
     # 将旧的注释分隔符格式转换为新的格式
     # 例如：/************************头 文 件******************************/
     # 转换为：/*************************** 头文件包含 ****************************/
+    return _fix_comment_separators(content)[0]
 
-    # 定义替换映射
-    replacements = [
-        (r'/\*.*头 文 件.*\*/', '/*************************** 头文件包含 ****************************/'),
-        (r'/\*.*外部函数声明.*\*/', '/*************************** 外部函数声明 ****************************/'),
-        (r'/\*.*外部声明.*\*/', '/*************************** 外部声明 ****************************/'),
-        (r'/\*.*宏 定 义.*\*/', '/*************************** 宏定义 ****************************/'),
-        (r'/\*.*类型定义.*\*/', '/*************************** 类型定义 ****************************/'),
-        (r'/\*.*全局变量.*\*/', '/*************************** 全局变量 ****************************/'),
-        (r'/\*.*模块变量.*\*/', '/*************************** 模块变量 ****************************/'),
-        (r'/\*.*前向声明.*\*/', '/*************************** 前向声明 ****************************/'),
-        (r'/\*.*函数实现.*\*/', '/*************************** 函数实现 ****************************/'),
-    ]
-
-    for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content)
+# 函数结束的 } 行，且下一行以 /** 开头（两行之间没有空行）
+_FUNC_GAP = re.compile(rb'^[^\S\n]*\}[^\S\n]*\n(?=[^\S\n]*/\*\*)', re.MULTILINE)
 
-    return content
+def _fix_function_spacing(content):
+    """修复函数之间的空行，返回 (新内容, 修改处数)"""
+    return _FUNC_GAP.subn(lambda m: m.group(0) + b'\n', content)
 
 def fix_function_spacing(content):
     """修复函数之间的空行"""
     # 在函数的 } 和下一个函数的 /** 之间添加空行
     # 这种模式：}    /**  -> }\n\n    /**
-    lines = content.split('\n')
-    result = []
-    i = 0
-
-    while i < len(lines):
-        result.append(lines[i])
-
-        # 如果当前行是函数结束的 }
-        if lines[i].strip() == '}':
-            # 检查下一行是否是 /** 或空白
-            if i + 1 < len(lines):
-                next_line = lines[i + 1].strip()
-                # 如果下一行是 /** 且中间没有空行
-                if next_line.startswith('/**'):
-                    # 检查中间是否有空行
-                    has_empty = False
-                    j = i + 1
-                    while j < len(lines) and lines[j].strip() == '':
-                        has_empty = True
-                        j += 1
-
-                    if not has_empty:
-                        result.append('')  # 添加空行
-
-        i += 1
-
-    return '\n'.join(result)
+    return _fix_function_spacing(content)[0]
+
+# return 语句行（去掉首尾空白后为 "return ...;" 或 "return;"）
+_RETURN_LINE = re.compile(rb'^[^\S\n]*return(?:[^\S\n][^\n]*;|;[^\S\n]*$)', re.MULTILINE)
+
+def _return_needs_gap(content, start, end):
+    """判断起止位置为 start/end 的 return 行前是否需要插入空行"""
+    # 上一行必须存在且不是空行
+    if start == 0:
+        return False
+    line_end = start - 1
+    line_start = content.rfind(b'\n', 0, line_end) + 1
+    if not content[line_start:line_end].strip():
+        return False
+
+    # 向上最多查看 4 行（不含首行），判断是否在函数内部
+    in_function = False
+    for _ in range(4):
+        if line_start == 0:
+            break
+        stripped = content[line_start:line_end].strip()
+        if stripped == b'}':
+            break
+        if stripped == b'{':
+            in_function = True
+            break
+        line_end = line_start - 1
+        line_start = content.rfind(b'\n', 0, line_end) + 1
+    if not in_function:
+        return False
+
+    # return 后面紧跟 } 时是最后一条语句，不插入空行
+    next_start = content.find(b'\n', end) + 1
+    if next_start == 0:
+        return True
+    next_end = content.find(b'\n', next_start)
+    if next_end == -1:
+        next_end = len(content)
+    return content[next_start:next_end].strip() != b'}'
+
+def _fix_return_spacing(content):
+    """修复 return 语句前的空行，返回 (新内容, 修改处数)"""
+    return _splice(content, [
+        (match.start(), match.start(), b'\n')
+        for match in _RETURN_LINE.finditer(content)
+        if _return_needs_gap(content, match.start(), match.end())
+    ])
 
 def fix_return_spacing(content):
     """修复 return 语句前的空行"""
-    lines = content.split('\n')
-    result = []
-    i = 0
-
-    while i < len(lines):
-        result.append(lines[i])
-
-        # 如果当前行是 return 语句
-        stripped = lines[i].strip()
-        if re.match(r'^return\s+.*;', stripped) or stripped == 'return;':
-            # 检查上一行是否是空行
-            if i > 0 and lines[i - 1].strip() != '':
-                # 检查是否在函数内部（不是最后一行）
-                in_function = False
-                for j in range(i - 1, max(0, i - 5), -1):
-                    if lines[j].strip() == '}':
-                        break
-                    if lines[j].strip() == '{':
-                        in_function = True
-                        break
-
-                # 检查 return 后面是否是 }
-                is_last_statement = False
-                if i + 1 < len(lines):
-                    next_stripped = lines[i + 1].strip()
-                    if next_stripped == '}':
-                        is_last_statement = True
-
-                # 如果是函数内的 return 且不是最后一条语句
-                if in_function and not is_last_statement:
-                    # 检查上一行是否已经是空行
-                    if i > 0 and lines[i - 1].strip() != '':
-                        result.pop()  # 移除刚添加的行
-                        result.append('')  # 添加空行
-                        result.append(lines[i])  # 重新添加当前行
-
-        i += 1
-
-    return '\n'.join(result)
-
-def fix_pointer_declaration(content):
-    """修复指针声明空格格式：type *ptr"""
-    # 这个比较复杂，需要仔细处理
-    # 简单的处理：将 type* ptr 或 type *ptr 转换为 type *ptr
-    # 但要小心不要破坏其他内容
-
-    # 这个函数留作后续实现，因为需要非常小心处理
-    return content
-
-def process_file(filepath):
-    """处理单个文件"""
-    print(f"处理文件: {filepath}")
+    return _fix_return_spacing(content)[0]
+
+def _apply_all(content):
+    """依次应用所有修复，返回 (新内容, 修改处数)；没有修改时原样返回 content"""
+    content, comments = _fix_comment_separators(content)
+    content, functions = _fix_function_spacing(content)
+    content, returns = _fix_return_spacing(content)
+    return content, comments + functions + returns
 
+def fingerprint(data):
+    """计算内容摘要"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def load_cache(cache_path, version):
+    """读取指纹缓存；脚本本身变化（version 不同）时缓存失效"""
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = json.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != version:
+        return {}
+    return cache.get('files', {})
+
+def save_cache(cache_path, version, files):
+    """写入指纹缓存，失败时返回错误信息"""
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'files': files}, f, indent=2, sort_keys=True)
+    except OSError as e:
+        return f"缓存写入失败: {e}"
+    return None
+
+def _fix_buffer(buf, known):
+    """
+    对文件内容（bytes 或 mmap）应用所有修复
+
+    Returns:
+        tuple: (原内容摘要, 修复后内容；与 known 一致或无需修改时为 None)
+    """
+    digest = fingerprint(buf)
+    if digest == known:
+        return digest, None
+
+    # 换行统一为 \n
+    normalized = buf.find(b'\r') != -1
+    if normalized:
+        buf = bytes(buf).replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+    content, changes = _apply_all(buf)
+    if not changes and not normalized:
+        return digest, None
+    return digest, content
+
+def fix_file(filepath, known=None, write=True):
+    """
+    修复单个文件
+
+    Args:
+        filepath: 文件路径
+        known: 上次处理后的内容摘要，与当前内容一致时跳过
+        write: 为 False 时只检查不写回，需要修改的文件按失败处理
+
+    Returns:
+        tuple: (错误信息或 None, 处理后内容的摘要)
+    """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # 按字节读写，省去 UTF-8 解码/编码；较大的文件通过 mmap 直接交给正则扫描
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest, content = _fix_buffer(mm, known)
+            else:
+                digest, content = _fix_buffer(f.read(), known)
+
+        # 内容有变化时才写回，避免无谓地更新 mtime 导致 make 重新编译
+        if content is None:
+            return None, digest
 
-        # 应用所有修复
-        content = fix_comment_separators(content)
-        content = fix_function_spacing(content)
-        content = fix_return_spacing(content)
+        if not write:
+            return "格式不符合要求", None
 
-        # 写回文件
-        with open(filepath, 'w', encoding='utf-8') as f:
+        with open(filepath, 'wb') as f:
             f.write(content)
 
-        print(f"  ✓ 完成")
-        return True
+        return None, fingerprint(content)
     except Exception as e:
-        print(f"  ✗ 错误: {e}")
-        return False
+        return str(e), None
+
+def report_file(filepath, error, log):
+    """将单个文件的处理结果追加到 log"""
+    log.append(f"处理文件: {filepath}")
+    if error is None:
+        log.append(f"  ✓ 完成")
+    else:
+        log.append(f"  ✗ 错误: {error}")
+    return error is None
 
 def main():
     """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='LoongArch64 代码风格重构脚本')
+    parser.add_argument('--check', action='store_true', help='只检查不修改，存在需要修改的文件时返回 1')
+
+    args = parser.parse_args()
+
     # 获取脚本所在目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
     success_count = 0
     fail_count = 0
+    # 输出先收集起来，最后一次性写到 stdout
+    log = []
+
+    # 以脚本自身内容作为缓存版本，修改规则后所有文件会重新处理
+    with open(os.path.abspath(__file__), 'rb') as f:
+        version = fingerprint(f.read())
+    cache_path = os.path.join(script_dir, CACHE_FILE)
+    cache = load_cache(cache_path, version)
 
+    # 一次目录扫描得到所有已存在的文件，代替逐个 os.path.exists
+    with os.scandir(script_dir) as entries:
+        present = {entry.name for entry in entries if entry.is_file()}
+
+    # 逐个文件串行处理：全部文件的修复只需十几毫秒，进程池的启动开销反而更大
     for filename in FILES:
         filepath = os.path.join(script_dir, filename)
 
-        if os.path.exists(filepath):
-            if process_file(filepath):
-                success_count += 1
-            else:
-                fail_count += 1
+        if filename not in present:
+            log.append(f"文件不存在: {filepath}")
+            fail_count += 1
+            continue
+
+        error, digest = fix_file(filepath, cache.get(filename), write=not args.check)
+        if report_file(filepath, error, log):
+            cache[filename] = digest
+            success_count += 1
         else:
-            print(f"文件不存在: {filepath}")
+            cache.pop(filename, None)
             fail_count += 1
 
-    print(f"\n处理完成:")
-    print(f"  成功: {success_count}")
-    print(f"  失败: {fail_count}")
+    # 检查模式下不写任何文件
+    if not args.check:
+        error = save_cache(cache_path, version, cache)
+        if error:
+            log.append(error)
+
+    log.append(f"\n处理完成:")
+    log.append(f"  成功: {success_count}")
+    log.append(f"  失败: {fail_count}")
+    sys.stdout.write('\n'.join(log) + '\n')
 
     return 0 if fail_count == 0 else 1
 